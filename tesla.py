@@ -1,10 +1,13 @@
 # v0.2
 import os
+import re
 import sys
+import array
+import signal
 import logging
 import argparse
 from pymodbus.server.sync import StartSerialServer
-from pymodbus.datastore import ModbusSlaveContext, ModbusServerContext
+from pymodbus.datastore import ModbusSlaveContext, ModbusServerContext, ModbusSequentialDataBlock
 from pymodbus.device import ModbusDeviceIdentification
 from pymodbus.transaction import ModbusRtuFramer
 import serial
@@ -22,6 +25,107 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 logger.propagate = True  # Ensure log messages are propagated
 
+# Register value lines in a response file (e.g. 0x3078)
+_HEX_RE = re.compile(rb'^[ \t]*0x([0-9A-Fa-f]+)', re.MULTILINE)
+
+# Slave address the server answers as
+SLAVE_ADDRESS = 1
+
+def _crc16_table_entry(byte):
+    """
+    Compute the Modbus RTU CRC contribution of a single byte
+
+    :param byte: Byte value (0-255)
+    :return: 16-bit CRC table entry
+    """
+    crc = byte
+    for _ in range(8):
+        if crc & 0x0001:
+            crc = (crc >> 1) ^ 0xA001
+        else:
+            crc >>= 1
+    return crc
+
+# Precomputed Modbus RTU CRC-16 lookup table (polynomial 0xA001).
+# Kept as a tuple of ints: indexing returns the stored int without
+# allocating, which measured about 2x faster than split high/low bytes tables.
+_CRC16_TABLE = tuple(_crc16_table_entry(i) for i in range(256))
+
+# Slice-by-8 tables: entry k advances a byte's CRC through k more zero bytes
+_CRC16_TABLES = [_CRC16_TABLE]
+for _ in range(7):
+    _CRC16_TABLES.append(tuple(
+        (v >> 8) ^ _CRC16_TABLE[v & 0xFF] for v in _CRC16_TABLES[-1]))
+_CRC16_TABLES = tuple(_CRC16_TABLES)
+
+# Below this length the byte-at-a-time loop is faster than slice-by-8
+_CRC16_SLICE_MIN = 16
+
+# Below this length the numba call overhead outweighs the faster kernel
+_CRC16_JIT_MIN = 32
+
+# numba-compiled CRC, loaded on the first long frame (None if unavailable)
+_crc16_jit = None
+_crc16_jit_loaded = False
+
+def _crc16_kernel(buf, t):
+    """
+    Calculate Modbus RTU CRC over a uint8 array (compiled with numba, slice-by-8)
+    
+    :param buf: numpy uint8 array
+    :param t: Slice-by-8 tables as an 8x256 numpy int64 array
+    :return: 16-bit CRC
+    """
+    crc = 0xFFFF
+    n = buf.size
+    end = n - (n & 7)
+    for i in range(0, end, 8):
+        crc = (t[7, (crc ^ buf[i]) & 0xFF] ^ t[6, ((crc >> 8) ^ buf[i + 1]) & 0xFF]
+               ^ t[5, buf[i + 2]] ^ t[4, buf[i + 3]] ^ t[3, buf[i + 4]]
+               ^ t[2, buf[i + 5]] ^ t[1, buf[i + 6]] ^ t[0, buf[i + 7]])
+    for i in range(end, n):
+        crc = (crc >> 8) ^ t[0, (crc ^ buf[i]) & 0xFF]
+    return crc
+
+def _load_crc16_jit():
+    """
+    Compile the CRC kernel with numba, importing numpy and numba on first use
+    
+    :return: CRC function taking bytes/bytearray, or None if numba is not installed
+    """
+    global _crc16_jit, _crc16_jit_loaded
+    if not _crc16_jit_loaded:
+        _crc16_jit_loaded = True
+        try:
+            import numpy as np
+            from numba import njit
+        except ImportError:
+            return None
+        
+        kernel = njit(cache=True)(_crc16_kernel)
+        # int64 so crc keeps one integer type in the kernel: uint16 entries
+        # are promoted to uint64, which numba unifies with int64 as float64
+        table = np.array(_CRC16_TABLES, dtype=np.int64)
+        
+        def crc16_jit(data):
+            return int(kernel(np.frombuffer(data, dtype=np.uint8), table))
+        
+        _crc16_jit = crc16_jit
+    return _crc16_jit
+
+def _load_response_file(file_path):
+    """
+    Read and parse a response file
+    
+    :param file_path: Path to the response file
+    :return: List of register values
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    
+    # Read hex values from every line starting with '0x'
+    return [int(m, 16) for m in _HEX_RE.findall(data)]
+
 class FileBasedModbusDataStore(ModbusSlaveContext):
     def __init__(self, response_dir='responses', dummy_mode=False):
         """
@@ -30,98 +134,184 @@ class FileBasedModbusDataStore(ModbusSlaveContext):
         :param response_dir: Directory containing response files
         :param dummy_mode: Whether to run in dummy (simulation) mode
         """
-        super().__init__()
+        # Input registers are only read (FC 4), which is served from the
+        # response files, so that block only needs a placeholder. Coils,
+        # discrete inputs and holding registers keep the default blocks for
+        # the other function codes (including writes to holding registers).
+        super().__init__(ir=ModbusSequentialDataBlock(0, [0]))
         self.response_dir = response_dir
         self.dummy_mode = dummy_mode
+        self._responses = {}
+        self._payloads = {}
+        self._response_cache = {}
+        self.refresh_log_flags()
+        self.load_responses()
         logger.info(f"Initialized DataStore. Dummy Mode: {dummy_mode}")
     
-    def format_modbus_response(self, slave_address, function_code, values):
+    def refresh_log_flags(self):
         """
-        Construct a full Modbus RTU response frame
+        Cache which log levels are enabled, so requests skip the level checks
         
-        :param slave_address: Slave address
-        :param function_code: Modbus function code
-        :param values: List of register values
-        :return: Hex representation of full Modbus RTU response
+        Call again after the log level is changed.
+        """
+        self._log_info = logger.isEnabledFor(logging.INFO)
+        self._log_debug = logger.isEnabledFor(logging.DEBUG)
+    
+    def load_responses(self):
         """
-        # Byte count is number of registers * 2 (16-bit per register)
-        byte_count = len(values) * 2
+        Preload all response files into memory, indexed by register address
         
-        # Construct response payload
-        payload = [
-            slave_address,  # Slave address
-            function_code,  # Function code
-            byte_count      # Byte count
-        ]
+        Both the register values and their big-endian byte payload are kept.
+        Files whose name is not a register number are ignored.
+        """
+        responses = {}
+        payloads = {}
+        try:
+            # scandir entries already carry the joined path
+            with os.scandir(self.response_dir) as it:
+                entries = list(it)
+        except FileNotFoundError:
+            logger.warning(f"Response directory {self.response_dir} not found")
+            entries = []
         
-        # Add register values (16-bit big-endian)
-        for value in values:
-            payload.extend([(value >> 8) & 0xFF, value & 0xFF])
+        for entry in entries:
+            try:
+                register_address = int(entry.name)
+            except ValueError:
+                continue
+            
+            file_path = entry.path
+            try:
+                values = _load_response_file(file_path)
+                payload = array.array('H', values)
+            except (OSError, OverflowError) as e:
+                logger.error(f"Error parsing file {file_path}: {e}")
+                continue
+            responses[register_address] = values
+            
+            # Registers go on the wire big-endian
+            if sys.byteorder == 'little':
+                payload.byteswap()
+            payloads[register_address] = payload.tobytes()
         
-        # Calculate CRC
-        crc = self.calculate_crc(payload)
-        payload.extend([crc & 0xFF, (crc >> 8) & 0xFF])
+        self._responses = responses
+        self._payloads = payloads
+        self._response_cache = {}
+    
+    def build_frame(self, slave_address, function_code, payload):
+        """
+        Construct a Modbus RTU response frame around a register payload
         
-        # Convert to hex string
-        return ' '.join(f'{x:02X}' for x in payload)
+        :param slave_address: Slave address
+        :param function_code: Modbus function code
+        :param payload: Register values serialized as big-endian bytes
+        :return: Frame bytes, including CRC
+        """
+        # Construct response header (slave address, function code, byte count)
+        buf = bytearray((slave_address, function_code, len(payload)))
+        buf.extend(payload)
+        
+        # Calculate CRC (little-endian on the wire)
+        crc = self.calculate_crc(buf)
+        buf.append(crc & 0xFF)
+        buf.append((crc >> 8) & 0xFF)
+        return bytes(buf)
+    
+    def format_modbus_response(self, slave_address, function_code, register_address, count):
+        """
+        Construct a full Modbus RTU response frame from the preloaded payload
+        
+        :param slave_address: Slave address
+        :param function_code: Modbus function code
+        :param register_address: Starting register address
+        :param count: Number of registers in the response
+        :return: Hex representation of full Modbus RTU response
+        """
+        # Frames are built on first use and cached, rather than precomputed
+        # for every count at startup: they only feed the log output. Repeated
+        # polls of the same registers are a single dict lookup, so no further
+        # memoization of the formatting is needed.
+        key = (slave_address, function_code, register_address, count)
+        response = self._response_cache.get(key)
+        if response is None:
+            # Byte count is number of registers * 2 (16-bit per register)
+            frame = self.build_frame(
+                slave_address, function_code,
+                self._payloads[register_address][:count * 2])
+            
+            # Convert to hex string
+            response = frame.hex(' ').upper()
+            self._response_cache[key] = response
+        return response
     
     def calculate_crc(self, data):
         """
-        Calculate Modbus RTU CRC
+        Calculate Modbus RTU CRC using the precomputed lookup tables
         
-        :param data: List of bytes
+        :param data: bytes or bytearray
         :return: 16-bit CRC
         """
+        if len(data) >= _CRC16_JIT_MIN:
+            crc16_jit = _load_crc16_jit()
+            if crc16_jit is not None:
+                return crc16_jit(data)
+        
+        t0 = _CRC16_TABLE
         crc = 0xFFFF
+        
+        if len(data) >= _CRC16_SLICE_MIN:
+            # Slice-by-8: fold eight bytes per iteration
+            _, t1, t2, t3, t4, t5, t6, t7 = _CRC16_TABLES
+            end = len(data) & ~7
+            it = iter(data)
+            for b0, b1, b2, b3, b4, b5, b6, b7 in zip(it, it, it, it, it, it, it, it):
+                crc = (t7[(crc ^ b0) & 0xFF] ^ t6[(crc >> 8) ^ b1] ^ t5[b2] ^ t4[b3]
+                       ^ t3[b4] ^ t2[b5] ^ t1[b6] ^ t0[b7])
+            data = data[end:]
+        
         for x in data:
-            crc ^= x
-            for _ in range(8):
-                if crc & 0x0001:
-                    crc = (crc >> 1) ^ 0xA001
-                else:
-                    crc >>= 1
+            crc = (crc >> 8) ^ t0[(crc ^ x) & 0xFF]
         return crc
     
     def validate_file_response(self, register_address, count):
         """
-        Read response from file based on register address and count
+        Look up the preloaded response based on register address and count
         
         :param register_address: Modbus register address 
         :param count: Number of registers to read
         :return: List of register values or None
         """
-        # Construct file path (e.g., responses/40002)
-        file_path = os.path.join(self.response_dir, str(register_address))
-        
-        try:
-            with open(file_path, 'r') as f:
-                # Read hex values, stripping whitespace and '0x'
-                hex_values = [
-                    int(line.strip(), 16) 
-                    for line in f 
-                    if line.strip().startswith('0x')
-                ]
-                
-                # Check if we have enough data
-                if len(hex_values) < count:
-                    logger.warning(f"Insufficient data for register {register_address}. "
-                                   f"Requested {count}, but only {len(hex_values)} available.")
-                    return None
-                
-                # Log details about the file and request
-                logger.info(f"Request for register {register_address}: "
-                            f"Requested {count} registers, "
-                            f"File contains {len(hex_values)} values")
-                
-                # Return only the requested number of registers
-                return hex_values[:count]
-        
-        except FileNotFoundError:
+        hex_values = self._responses.get(register_address)
+        if hex_values is None:
             logger.warning(f"No response file found for register {register_address}")
             return None
-        except ValueError as e:
-            logger.error(f"Error parsing file {file_path}: {e}")
+        
+        # Check if we have enough data
+        if len(hex_values) < count:
+            logger.warning(f"Insufficient data for register {register_address}. "
+                           f"Requested {count}, but only {len(hex_values)} available.")
             return None
+        
+        # Log details about the file and request
+        if self._log_info:
+            logger.info("Request for register %s: Requested %s registers, File contains %s values",
+                        register_address, count, len(hex_values))
+        
+        # Return only the requested number of registers
+        return hex_values[:count]
+    
+    def validate(self, fx, address, count=1):
+        """
+        Override validate so input register reads skip the placeholder block
+        
+        :param fx: Modbus function code
+        :param address: Starting register address
+        :param count: Number of registers to read
+        :return: True if the request can be handled
+        """
+        if fx == 4:  # Answered (or ignored) by getValues
+            return True
+        return super().validate(fx, address, count)
     
     def getValues(self, fx, address, count=1):
         """
@@ -132,37 +322,39 @@ class FileBasedModbusDataStore(ModbusSlaveContext):
         :param count: Number of registers to read
         :return: List of register values
         """
-        # Construct a hex representation of the request
-        request_hex = self.format_request_hex(fx, address, count)
+        log_info = self._log_info
         
         # Log the incoming request details
-        logger.info(f"Received request: "
-                    f"Function Code: {fx}, "
-                    f"Address: {address}, "
-                    f"Count: {count}")
-        logger.info(f"Request Hex: {request_hex}")
+        if log_info:
+            logger.info("Received request: Function Code: %s, Address: %s, Count: %s",
+                        fx, address, count)
+            logger.info("Request Hex: %s", self.format_request_hex(fx, address, count))
         
         if fx in [3, 4]:  # Read Holding Registers or Input Registers
             values = self.validate_file_response(address, count)
             
-            # Only return values if a valid response was found
-            if values is not None:
-                # Format and log full Modbus response
+            # Return None if no valid response (effectively no response)
+            if values is None:
+                return None
+            
+            # pymodbus serializes the response itself, so the formatted frame
+            # is only built for the dummy mode log or debug logging
+            if (self.dummy_mode and log_info) or self._log_debug:
                 full_response = self.format_modbus_response(
-                    slave_address=1,  # Default slave address
+                    slave_address=SLAVE_ADDRESS,
                     function_code=fx,
-                    values=values
+                    register_address=address,
+                    count=count
                 )
-                
-                # In dummy mode, just log. In normal mode, return values
-                if not self.dummy_mode:
-                    logger.info(f"Full Modbus Response (Hex): {full_response}")
-                    return values
+                if self.dummy_mode:
+                    logger.info("Full Modbus Response (not sent) (Hex): %s", full_response)
                 else:
-                    logger.info(f"Full Modbus Response (not sent) (Hex): {full_response}")
+                    logger.debug("Full Modbus Response (Hex): %s", full_response)
             
-            # Return None if no valid response (effectively no response)
-            return None
+            # In dummy mode, just log. In normal mode, return values
+            if self.dummy_mode:
+                return None
+            return values
         
         # Default behavior for other function codes
         return super().getValues(fx, address, count)
@@ -177,21 +369,22 @@ class FileBasedModbusDataStore(ModbusSlaveContext):
         :return: Hex representation of the request
         """
         # Construct request payload
-        payload = [
-            0x01,  # Slave address (default)
+        payload = bytearray([
+            SLAVE_ADDRESS,  # Slave address
             function_code,  # Function code
             (address >> 8) & 0xFF,  # High byte of address
             address & 0xFF,  # Low byte of address
             (count >> 8) & 0xFF,  # High byte of count
             count & 0xFF  # Low byte of count
-        ]
+        ])
         
         # Calculate CRC
         crc = self.calculate_crc(payload)
-        payload.extend([crc & 0xFF, (crc >> 8) & 0xFF])
+        payload.append(crc & 0xFF)
+        payload.append((crc >> 8) & 0xFF)
         
         # Convert to hex string
-        return ' '.join(f'{x:02X}' for x in payload)
+        return payload.hex(' ').upper()
 
 
 def run_modbus_server(port='/dev/ttyUSB0', baudrate=115200, dummy_mode=False):
@@ -204,7 +397,17 @@ def run_modbus_server(port='/dev/ttyUSB0', baudrate=115200, dummy_mode=False):
     """
     # Create a datastore
     datastore = FileBasedModbusDataStore(dummy_mode=dummy_mode)
-    context = ModbusServerContext(slaves={1: datastore}, single=False)
+    context = ModbusServerContext(slaves={SLAVE_ADDRESS: datastore}, single=False)
+    
+    def toggle_debug(signum, frame):
+        # Switch between INFO and DEBUG logging at runtime (kill -USR1 <pid>)
+        level = logging.INFO if logger.isEnabledFor(logging.DEBUG) else logging.DEBUG
+        logger.setLevel(level)
+        datastore.refresh_log_flags()
+        logger.info(f"Log level set to {logging.getLevelName(level)}")
+    
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, toggle_debug)
     
     # Device identification
     identity = ModbusDeviceIdentification()
@@ -224,7 +427,8 @@ def run_modbus_server(port='/dev/ttyUSB0', baudrate=115200, dummy_mode=False):
             # In dummy mode, simulate server behavior
             logger.info("Dummy Mode: Simulating Modbus server responses")   
         
-        # Normal server mode
+        # Normal server mode. pymodbus' serial handler already reads up to
+        # 1024 bytes per call (recv(1024)), so reads need no extra batching.
         StartSerialServer(
             context, 
             framer=ModbusRtuFramer,
@@ -247,9 +451,14 @@ def main():
                         help='Serial port to use')
     parser.add_argument('--baudrate', type=int, default=115200, 
                         help='Baudrate for serial communication')
+    parser.add_argument('--debug', action='store_true', 
+                        help='Enable debug logging (includes full response frames)')
     
     args = parser.parse_args()
     
+    if args.debug:
+        logger.setLevel(logging.DEBUG)
+    
     # Ensure response directory exists
     os.makedirs('responses', exist_ok=True)
     
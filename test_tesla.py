@@ -0,0 +1,134 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import tesla
+
+RESPONSE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'responses')
+
+
+def bit_serial_crc(data):
+    """
+    Reference Modbus RTU CRC, computed one bit at a time
+    
+    :param data: bytes
+    :return: 16-bit CRC
+    """
+    crc = 0xFFFF
+    for x in data:
+        crc ^= x
+        for _ in range(8):
+            if crc & 0x0001:
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc >>= 1
+    return crc
+
+
+class CalculateCrcTest(unittest.TestCase):
+    def setUp(self):
+        self.datastore = tesla.FileBasedModbusDataStore(response_dir=RESPONSE_DIR)
+        rnd = random.Random(0)
+        self.frames = [bytes(rnd.randrange(256) for _ in range(n)) for n in range(301)]
+
+    def check_against_reference(self):
+        # Read holding register 0, count 1 -> CRC 0x0A84 (84 0A on the wire)
+        self.assertEqual(self.datastore.calculate_crc(bytes.fromhex('010300000001')), 0x0A84)
+        for frame in self.frames:
+            expected = bit_serial_crc(frame)
+            self.assertEqual(self.datastore.calculate_crc(frame), expected, len(frame))
+            self.assertEqual(self.datastore.calculate_crc(bytearray(frame)), expected, len(frame))
+
+    def test_pure_python(self):
+        with mock.patch.object(tesla, '_load_crc16_jit', return_value=None):
+            self.check_against_reference()
+
+    def test_numba(self):
+        crc16_jit = tesla._load_crc16_jit()
+        if crc16_jit is None:
+            self.skipTest('numba not installed')
+        self.check_against_reference()
+        # Short frames skip the kernel in calculate_crc, so also call it directly
+        for frame in self.frames:
+            self.assertEqual(crc16_jit(frame), bit_serial_crc(frame), len(frame))
+            self.assertEqual(crc16_jit(bytearray(frame)), bit_serial_crc(frame), len(frame))
+
+
+class LoadResponseFileTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w', newline='') as f:
+            f.write(content)
+        return path
+
+    def test_parses_hex_lines(self):
+        path = self.write_file('1', '0x0001\r\n  0x00ff\n\t0xABCD\n0xFFFF')
+        self.assertEqual(tesla._load_response_file(path), [0x0001, 0x00FF, 0xABCD, 0xFFFF])
+
+    def test_skips_other_lines(self):
+        # Blank lines, comments, bare '0x' and uppercase '0X' are not values
+        path = self.write_file('1', '\n# comment\n0x\n0X0002\nvalue 0x0003\n0x0004\n')
+        self.assertEqual(tesla._load_response_file(path), [0x0004])
+
+    def test_ignores_trailing_text(self):
+        path = self.write_file('1', '0x0001 first\n0x0002zz\n')
+        self.assertEqual(tesla._load_response_file(path), [0x0001, 0x0002])
+
+    def test_value_too_large_rejects_file(self):
+        self.write_file('2', '0x0001\n0x10000\n')
+        self.write_file('3', '0x0003\n')
+        datastore = tesla.FileBasedModbusDataStore(response_dir=self.tmpdir.name)
+        self.assertIsNone(datastore.validate_file_response(2, 1))
+        self.assertEqual(datastore.validate_file_response(3, 1), [0x0003])
+
+
+class FormatModbusResponseTest(unittest.TestCase):
+    def setUp(self):
+        self.datastore = tesla.FileBasedModbusDataStore(response_dir=RESPONSE_DIR)
+
+    def test_golden_frames(self):
+        # Expected output from the original (bit-serial CRC) implementation
+        self.assertEqual(
+            self.datastore.format_modbus_response(1, 3, 40002, 6),
+            '01 03 0C 00 01 00 42 47 65 6E 65 72 61 63 00 E9 2F')
+        self.assertEqual(
+            self.datastore.format_modbus_response(1, 4, 1, 3),
+            '01 04 06 30 78 30 30 30 30 DE 72')
+        self.assertEqual(
+            self.datastore.format_modbus_response(1, 3, 136, 10),
+            '01 03 14 42 AE 94 A0 43 BD 25 17 40 07 80 5A BE 01 C3 BF C2 38 43 0D 59 96')
+
+    def test_golden_long_frame(self):
+        # All 55 registers of file 1: 115 bytes, long enough for the numba CRC
+        frame = self.datastore.format_modbus_response(1, 3, 1, 55).split()
+        self.assertEqual(len(frame), 3 + 110 + 2)
+        self.assertEqual(frame[:5], ['01', '03', '6E', '30', '78'])
+        self.assertEqual(frame[-2:], ['77', '6F'])
+
+    def test_get_values(self):
+        self.assertEqual(
+            self.datastore.getValues(3, 244, 8),
+            [16268, 34957, 16497, 56646, 16103, 51981, 15560, 23478])
+        self.assertIsNone(self.datastore.getValues(3, 244, 9))
+        self.assertIsNone(self.datastore.getValues(4, 7, 1))
+
+
+class ValidateTest(unittest.TestCase):
+    def test_request_addresses_accepted(self):
+        datastore = tesla.FileBasedModbusDataStore(response_dir=RESPONSE_DIR)
+        # Reads, coils, discrete inputs and writes (FC 1-6, 15, 16)
+        for fx in (1, 2, 3, 4, 5, 6, 15, 16):
+            for address in (0, 1, 40002):
+                self.assertTrue(datastore.validate(fx, address, 1), (fx, address))
+        # Holding registers keep the default block's bounds
+        self.assertFalse(datastore.validate(3, 65535, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()